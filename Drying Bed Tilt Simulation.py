@@ -1,8 +1,12 @@
+import ctypes
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
+from OpenGL.GL import shaders
 from OpenGL.GLU import *
+import math
 import pymunk
+import pymunk.batch
 import numpy as np
 import random
 import time
@@ -14,8 +18,11 @@ BED_R = 9.0
 N_PELLETS = 500
 PELLET_R = 0.2
 LIFT_HEIGHT = 1.5
+SPHERE_SLICES, SPHERE_STACKS = 4, 4  # Pellet sphere tessellation (~4px on screen)
 FORCE_FACTOR = 100.0    # Force multiplier for tilt
-DAMPING = 10000         # High damping for rolling resistance
+PHYSICS_DT = 1 / 30.0   # Fixed physics timestep; rendering interpolates to 60fps
+IDLE_SPEED_EPS = 1e-3   # Max |velocity| at which idle pellets count as at rest
+DAMPING = 0.01          # space.damping: velocity fraction kept per second (very damped)
 LIGHT_POSITION = [0, 20, 0, 1]
 
 # --- Animation Parameters (LOCKED) ---
@@ -31,28 +38,30 @@ DUMP_IMPULSE = 2.5
 ACTUATOR_ANGLES_DEG = np.array([90, 210, 330])
 ACTUATOR_ANGLES_RAD = np.deg2rad(ACTUATOR_ANGLES_DEG)
 
+# Actuator contact points only move vertically, so the x/z legs of the plane's
+# edge vectors are constants, as is the y component of their cross product.
+ACTUATOR_X = BED_R * np.cos(ACTUATOR_ANGLES_RAD)
+ACTUATOR_Z = BED_R * np.sin(ACTUATOR_ANGLES_RAD)
+_EDGE1_X, _EDGE1_Z = float(ACTUATOR_X[1] - ACTUATOR_X[0]), float(ACTUATOR_Z[1] - ACTUATOR_Z[0])
+_EDGE2_X, _EDGE2_Z = float(ACTUATOR_X[2] - ACTUATOR_X[0]), float(ACTUATOR_Z[2] - ACTUATOR_Z[0])
+_NORMAL_Y = _EDGE1_Z * _EDGE2_X - _EDGE1_X * _EDGE2_Z
+
+# Bed rim vertices at 10-degree steps, computed once at module load
+BED_ANGLES_RAD = np.deg2rad(np.arange(37) * 10)
+BED_RIM_X = BED_R * np.cos(BED_ANGLES_RAD)
+BED_RIM_Z = BED_R * np.sin(BED_ANGLES_RAD)
+
 # ---------------- Physics and Pellet Management ----------------
 def get_initial_pellets(n, mode='random'):
-    pellets = []
-    if mode == 'mountain':
-        for _ in range(n):
-            r = np.sqrt(random.random()) * (BED_R * 0.3)
-            a = random.uniform(0, 2 * np.pi)
-            pos = (BED_CENTER_2D[0] + r * np.cos(a), BED_CENTER_2D[1] + r * np.sin(a))
-            pellets.append(pos)
-    else:
-        for _ in range(n):
-            r = np.sqrt(random.random()) * (BED_R - PELLET_R * 2)
-            a = random.uniform(0, 2 * np.pi)
-            pos = (BED_CENTER_2D[0] + r * np.cos(a), BED_CENTER_2D[1] + r * np.sin(a))
-            pellets.append(pos)
-    return pellets
+    max_r = BED_R * 0.3 if mode == 'mountain' else BED_R - PELLET_R * 2
+    r = np.sqrt(np.random.random(n)) * max_r
+    a = np.random.random(n) * 2 * np.pi
+    return np.stack([BED_CENTER_2D[0] + r * np.cos(a),
+                     BED_CENTER_2D[1] + r * np.sin(a)], axis=1)
 
 def add_pellet(space, pos):
     body = pymunk.Body(1, 100)
     body.position = pos
-    body.linear_damping = DAMPING
-    body.angular_damping = DAMPING
     shape = pymunk.Circle(body, PELLET_R)
     shape.elasticity = 0.1
     shape.friction = 1.2
@@ -62,77 +71,156 @@ def add_pellet(space, pos):
 def setup_space(pellet_positions):
     space = pymunk.Space()
     space.gravity = (0, 0)
-    
+    # Rolling resistance for the whole pellet population, applied in a single
+    # tight C path per step instead of a per-body damping attribute (which
+    # pymunk bodies do not actually support - the old assignments were inert).
+    space.damping = DAMPING
+
     static_body = space.static_body
-    wall_segments = []
-    num_segments = 36
-    for i in range(num_segments):
-        angle1 = 2 * np.pi * i / num_segments
-        angle2 = 2 * np.pi * (i + 1) / num_segments
-        p1 = (BED_CENTER_2D[0] + BED_R * np.cos(angle1), BED_CENTER_2D[1] + BED_R * np.sin(angle1))
-        p2 = (BED_CENTER_2D[0] + BED_R * np.cos(angle2), BED_CENTER_2D[1] + BED_R * np.sin(angle2))
-        segment = pymunk.Segment(static_body, p1, p2, 0.1)
+    # 16 segments keep the arc within ~0.17 units of the true circle (less
+    # than PELLET_R), while halving the broadphase work of the old 36 walls.
+    num_segments = 16
+    angles = np.linspace(0, 2 * np.pi, num_segments + 1)
+    xs = BED_CENTER_2D[0] + BED_R * np.cos(angles)
+    ys = BED_CENTER_2D[1] + BED_R * np.sin(angles)
+    wall_segments = [pymunk.Segment(static_body, (xs[i], ys[i]), (xs[i + 1], ys[i + 1]), 0.1)
+                     for i in range(num_segments)]
+    for segment in wall_segments:
         segment.elasticity = 0.5
         segment.friction = 1.5
-        wall_segments.append(segment)
     space.add(*wall_segments)
-    pellet_shapes = [add_pellet(space, pos) for pos in pellet_positions]
+    pellet_shapes = [add_pellet(space, (x, y)) for x, y in pellet_positions]
     return space, pellet_shapes
 
 def get_plane_normal(lifts):
-    points = []
-    for i, angle in enumerate(ACTUATOR_ANGLES_RAD):
-        points.append([BED_R * np.cos(angle), lifts[i], BED_R * np.sin(angle)])
-    p1, p2, p3 = np.array(points[0]), np.array(points[1]), np.array(points[2])
-    normal = np.cross(p2 - p1, p3 - p1)
-    if normal[1] < 0: normal *= -1
-    norm_val = np.linalg.norm(normal)
-    if norm_val < 1e-6: return np.array([0, 1, 0])
-    return normal / norm_val
-
-def apply_forces_to_pellets(space, lifts, impulse):
+    # Hand-expanded cross product of the two plane edge vectors; only the lift
+    # terms vary, so no arrays, trig or np.cross allocations are needed.
+    lift1, lift2 = lifts[1] - lifts[0], lifts[2] - lifts[0]
+    nx = lift1 * _EDGE2_Z - _EDGE1_Z * lift2
+    ny = _NORMAL_Y
+    nz = _EDGE1_X * lift2 - lift1 * _EDGE2_X
+    if ny < 0:
+        nx, ny, nz = -nx, -ny, -nz
+    norm_val = math.sqrt(nx * nx + ny * ny + nz * nz)
+    if norm_val < 1e-6: return (0.0, 1.0, 0.0)
+    return (nx / norm_val, ny / norm_val, nz / norm_val)
+
+# Reusable batch buffer for force uploads. The force is the same for every
+# pellet, so the whole space can be updated with a single C call instead of
+# one FFI crossing per body. Dynamic bodies come first in pymunk's batch
+# order, so a buffer of N_PELLETS rows addresses exactly the pellets.
+_FORCE_ARRAY = np.zeros((N_PELLETS, 2))
+_FORCE_BUFFER = pymunk.batch.Buffer()
+_FORCE_BUFFER.set_float_buf(_FORCE_ARRAY)
+_POSITION_BUFFER = pymunk.batch.Buffer()
+
+def get_pellet_positions_2d(space):
+    """All pellet positions as an (N, 2) float64 array, fetched in one C call."""
+    _POSITION_BUFFER.clear()
+    pymunk.batch.get_space_bodies(space, pymunk.batch.BodyFields.POSITION, _POSITION_BUFFER)
+    positions = np.frombuffer(_POSITION_BUFFER.float_buf(), dtype=np.float64).reshape(-1, 2)
+    # The static body comes last in batch order. This holds only while no body
+    # sleeps (Chipmunk reorders sleeping bodies after the static body), so the
+    # space must be left with sleeping disabled (the default).
+    return positions[:N_PELLETS]
+
+_VELOCITY_BUFFER = pymunk.batch.Buffer()
+
+def get_max_pellet_speed(space):
+    """Largest pellet velocity component magnitude, fetched in one C call."""
+    _VELOCITY_BUFFER.clear()
+    pymunk.batch.get_space_bodies(space, pymunk.batch.BodyFields.VELOCITY, _VELOCITY_BUFFER)
+    velocities = np.frombuffer(_VELOCITY_BUFFER.float_buf(), dtype=np.float64)
+    return np.abs(velocities[:N_PELLETS * 2]).max()
+
+def apply_forces_to_pellets(space, normal, impulse):
     """NEW PHYSICS: Applies a force to each pellet based on the bed's tilt."""
-    normal = get_plane_normal(lifts)
     # The gravity force is the projection of the 3D 'up' vector onto the 2D plane
-    force_vector = (-normal[0], -normal[2])
-    
-    for body in space.bodies:
-        if body.body_type == pymunk.Body.DYNAMIC:
-            force = (force_vector[0] * FORCE_FACTOR * impulse, 
-                     force_vector[1] * FORCE_FACTOR * impulse)
-            body.apply_force_at_local_point(force)
+    _FORCE_ARRAY[:, 0] = -normal[0] * FORCE_FACTOR * impulse
+    _FORCE_ARRAY[:, 1] = -normal[2] * FORCE_FACTOR * impulse
+    pymunk.batch.set_space_bodies(space, pymunk.batch.BodyFields.FORCE, _FORCE_BUFFER)
 
 # ---------------- Animation Sequences ----------------
+# Each step is one 20-byte structured-array record, so the per-frame dispatch
+# reads contiguous memory instead of chasing dict+list indirections.
+ANIM_STEP_DTYPE = np.dtype([('lifts', '3f4'), ('duration', 'f4'), ('impulse', 'f4')])
+
 def generate_flatten_sequence():
-    seq = []
+    steps = []
     num_lift_steps = 10
     for i in range(num_lift_steps):
         lift_amount = (i + 1) / num_lift_steps * LIFT_HEIGHT
-        seq.append({'lifts': [0, lift_amount, lift_amount], 'duration': FLATTEN_WALL_LIFT_DUR / num_lift_steps})
-    seq.append({'lifts': [LIFT_HEIGHT, 0, 0], 'duration': 0.01, 'impulse': FLATTEN_RAM_IMPULSE})
-    seq.append({'lifts': [LIFT_HEIGHT, 0, 0], 'duration': FLATTEN_RAM_HOLD_DUR})
-    seq.append({'lifts': [0, 0, 0], 'duration': 2.0})
-    return seq
+        steps.append(((0, lift_amount, lift_amount), FLATTEN_WALL_LIFT_DUR / num_lift_steps, 1.0))
+    steps.append(((LIFT_HEIGHT, 0, 0), 0.01, FLATTEN_RAM_IMPULSE))
+    steps.append(((LIFT_HEIGHT, 0, 0), FLATTEN_RAM_HOLD_DUR, 1.0))
+    steps.append(((0, 0, 0), 2.0, 1.0))
+    return np.array(steps, dtype=ANIM_STEP_DTYPE)
 
 def generate_scramble_sequence():
-    seq = []
     thump_lifts = [0, 0, 0]
     random_actuator_idx = random.randint(0, 2)
     thump_lifts[random_actuator_idx] = LIFT_HEIGHT
-    seq.append({'lifts': thump_lifts, 'duration': SCRAMBLE_THUMP_DUR, 'impulse': SCRAMBLE_IMPULSE})
-    seq.append({'lifts': [0, 0, 0], 'duration': SCRAMBLE_PAUSE})
-    return seq
+    return np.array([(thump_lifts, SCRAMBLE_THUMP_DUR, SCRAMBLE_IMPULSE),
+                     ((0, 0, 0), SCRAMBLE_PAUSE, 1.0)], dtype=ANIM_STEP_DTYPE)
 
 def generate_dump_sequence(cycles=10):
-    seq = []
     pushes = [
-        {'lifts': [LIFT_HEIGHT, 0, 0], 'duration': DUMP_HOLD_DUR, 'impulse': DUMP_IMPULSE},
-        {'lifts': [0, LIFT_HEIGHT, 0], 'duration': DUMP_HOLD_DUR, 'impulse': DUMP_IMPULSE},
-        {'lifts': [0, 0, LIFT_HEIGHT], 'duration': DUMP_HOLD_DUR, 'impulse': DUMP_IMPULSE}
+        ((LIFT_HEIGHT, 0, 0), DUMP_HOLD_DUR, DUMP_IMPULSE),
+        ((0, LIFT_HEIGHT, 0), DUMP_HOLD_DUR, DUMP_IMPULSE),
+        ((0, 0, LIFT_HEIGHT), DUMP_HOLD_DUR, DUMP_IMPULSE)
     ]
-    for _ in range(cycles):
-        seq.extend(pushes)
-    return seq
+    return np.array(pushes * cycles, dtype=ANIM_STEP_DTYPE)
+
+# ---------------- Pellet Rendering (Instanced) ----------------
+# One shared sphere mesh plus a per-instance offset attribute lets all pellets
+# go out in a single glDrawArraysInstanced call instead of 500 gluSphere calls.
+PELLET_VERTEX_SHADER = """
+#version 120
+#extension GL_ARB_draw_instanced : enable
+attribute vec3 instance_offset;
+varying vec3 v_normal;
+varying vec3 v_eye_pos;
+void main() {
+    vec4 eye = gl_ModelViewMatrix * vec4(gl_Vertex.xyz + instance_offset, 1.0);
+    v_eye_pos = eye.xyz;
+    v_normal = gl_NormalMatrix * gl_Normal;
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+PELLET_FRAGMENT_SHADER = """
+#version 120
+uniform vec3 pellet_color;
+varying vec3 v_normal;
+varying vec3 v_eye_pos;
+void main() {
+    vec3 n = normalize(v_normal);
+    vec3 l = normalize(gl_LightSource[0].position.xyz - v_eye_pos);
+    float diff = max(dot(n, l), 0.0);
+    vec3 color = gl_LightSource[0].ambient.rgb * pellet_color
+               + gl_LightSource[0].diffuse.rgb * pellet_color * diff;
+    gl_FragColor = vec4(color, 1.0);
+}
+"""
+
+def build_sphere_mesh(radius, slices, stacks):
+    """Triangle mesh for one sphere, interleaved position+normal, baked once."""
+    verts = []
+    for i in range(stacks):
+        lat0 = np.pi * (i / stacks - 0.5)
+        lat1 = np.pi * ((i + 1) / stacks - 0.5)
+        for j in range(slices):
+            lon0 = 2 * np.pi * j / slices
+            lon1 = 2 * np.pi * (j + 1) / slices
+            corners = []
+            for lat, lon in ((lat0, lon0), (lat0, lon1), (lat1, lon1), (lat1, lon0)):
+                nx = np.cos(lat) * np.cos(lon)
+                ny = np.sin(lat)
+                nz = np.cos(lat) * np.sin(lon)
+                corners.append((radius * nx, radius * ny, radius * nz, nx, ny, nz))
+            for idx in (0, 1, 2, 0, 2, 3):
+                verts.extend(corners[idx])
+    return np.array(verts, dtype=np.float32)
 
 # ---------------- Main Application Class ----------------
 class ShakerBedSim:
@@ -143,6 +231,17 @@ class ShakerBedSim:
         self.clock = pygame.time.Clock()
         self.is_paused = False
         self.loop_animation = True
+        # The light and floor plane never move, so the planar-projection
+        # shadow matrix is a fixed rank-1 update computed once.
+        floor_plane = np.array([0, 1, 0, 0.01])
+        light_pos = np.array(LIGHT_POSITION, dtype=np.float64)
+        d = float(floor_plane @ light_pos)
+        self.shadow_matrix = (np.eye(4) * d
+                              - np.outer(light_pos, floor_plane)).astype(np.float32).flatten()
+        # Deterministic sequences are built once; scramble thumps a random
+        # actuator per loop, so it is regenerated on demand.
+        self.flatten_sequence = generate_flatten_sequence()
+        self.dump_sequence = generate_dump_sequence()
         self.setup_opengl()
         self.reset_simulation()
 
@@ -159,6 +258,70 @@ class ShakerBedSim:
         glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.8, 0.8, 0.8, 1])
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.quadric = gluNewQuadric()
+        gluQuadricNormals(self.quadric, GLU_FLAT)  # smooth shading buys nothing at this size
+        self.setup_pellet_instancing()
+        # Compiled sphere for the non-instanced fallback, so each pellet costs
+        # a translate and a glCallList instead of re-tessellating a quadric.
+        self.sphere_list = glGenLists(1)
+        glNewList(self.sphere_list, GL_COMPILE)
+        gluSphere(self.quadric, PELLET_R, SPHERE_SLICES, SPHERE_STACKS)
+        glEndList()
+        # Static bed geometry is compiled into display lists once; the shadow
+        # pass needs a variant without color calls so its flat color sticks.
+        self.bed_list = glGenLists(2)
+        glNewList(self.bed_list, GL_COMPILE)
+        self.emit_bed_geometry(with_colors=True)
+        glEndList()
+        self.bed_shadow_list = self.bed_list + 1
+        glNewList(self.bed_shadow_list, GL_COMPILE)
+        self.emit_bed_geometry(with_colors=False)
+        glEndList()
+
+    def emit_bed_geometry(self, with_colors):
+        if with_colors: glColor3f(0.5, 0.5, 0.55)
+        glBegin(GL_TRIANGLE_FAN)
+        glNormal3f(0, 1, 0)
+        glVertex3f(0, 0, 0)
+        for x, z in zip(BED_RIM_X, BED_RIM_Z):
+            glVertex3f(x, 0, z)
+        glEnd()
+        if with_colors: glColor3f(0.8, 0.8, 0.8)
+        glBegin(GL_QUAD_STRIP)
+        for x, z in zip(BED_RIM_X, BED_RIM_Z):
+            glNormal3f(x, 0, z)
+            glVertex3f(x, 0, z)
+            glVertex3f(x, 0.5, z)
+        glEnd()
+
+    def setup_pellet_instancing(self):
+        self.pellet_shader = None
+        # A GL 2.1 context compiles GLSL 1.20 fine but lacks the instancing
+        # entry points (GL 3.3 / ARB_instanced_arrays), so check those first;
+        # PyOpenGL's lazy wrappers are falsy when the driver doesn't export them.
+        if not (bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)):
+            print("Instanced pellet rendering unavailable (no instancing entry points), "
+                  "using gluSphere fallback.")
+            return
+        try:
+            program = shaders.compileProgram(
+                shaders.compileShader(PELLET_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(PELLET_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+        except Exception as e:
+            print(f"Instanced pellet rendering unavailable ({e}), using gluSphere fallback.")
+            return
+        mesh = build_sphere_mesh(PELLET_R, SPHERE_SLICES, SPHERE_STACKS)
+        self.sphere_vertex_count = len(mesh) // 6
+        self.sphere_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.sphere_vbo)
+        glBufferData(GL_ARRAY_BUFFER, mesh.nbytes, mesh, GL_STATIC_DRAW)
+        self.instance_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, N_PELLETS * 3 * 4, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.instance_attrib = glGetAttribLocation(program, "instance_offset")
+        self.pellet_color_uniform = glGetUniformLocation(program, "pellet_color")
+        self.pellet_shader = program
 
     def reset_simulation(self, mode='random'):
         self.space, self.pellet_shapes = setup_space(get_initial_pellets(N_PELLETS, mode))
@@ -169,17 +332,38 @@ class ShakerBedSim:
         self.current_animation_name = "IDLE"
         self.lifts = [0, 0, 0]
         self.impulse = 1.0
+        self._cached_lifts = None
+        self._cached_normal = None
+        self.physics_accumulator = 0.0
+        self._idle_frames = 0
+        self._low_speed_samples = 0
+        self._pellets_asleep = False
+        # Snapshots around the latest physics step, for render interpolation
+        self._curr_positions_2d = get_pellet_positions_2d(self.space).copy()
+        self._prev_positions_2d = self._curr_positions_2d
+
+    def get_normal(self):
+        """Plane normal for the current lifts, recomputed only when they change."""
+        if self.lifts != self._cached_lifts:
+            self._cached_lifts = list(self.lifts)
+            self._cached_normal = get_plane_normal(self.lifts)
+        return self._cached_normal
 
     def run(self):
+        # Monotonic clock (wall-clock time.time() can jump backwards under
+        # NTP adjustment), bound to a local to skip the attribute lookup in
+        # the hot event loop.
+        _now = time.perf_counter
         running = True
         while running:
+            dt = self.clock.tick(60) / 1000.0
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_1:
                         self.reset_simulation('mountain')
-                        self.animation_sequence = generate_flatten_sequence()
+                        self.animation_sequence = self.flatten_sequence
                         self.current_animation_name = "Flattening"
                         self.is_animating = True
                         self.anim_step_idx = -1
@@ -191,7 +375,7 @@ class ShakerBedSim:
                         self.anim_step_idx = -1
                     elif event.key == pygame.K_3:
                         self.reset_simulation()
-                        self.animation_sequence = generate_dump_sequence()
+                        self.animation_sequence = self.dump_sequence
                         self.current_animation_name = "Dumping"
                         self.is_animating = True
                         self.anim_step_idx = -1
@@ -201,7 +385,7 @@ class ShakerBedSim:
                         self.loop_animation = not self.loop_animation
             
             if self.is_animating and not self.is_paused:
-                now = time.time()
+                now = _now()
                 if self.anim_step_idx == -1 or (now - self.anim_step_start_time) > self.animation_sequence[self.anim_step_idx]['duration']:
                     self.anim_step_idx += 1
                     if self.anim_step_idx >= len(self.animation_sequence):
@@ -216,19 +400,42 @@ class ShakerBedSim:
                     if self.is_animating:
                         self.anim_step_start_time = now
                         step_data = self.animation_sequence[self.anim_step_idx]
-                        self.lifts = step_data['lifts']
-                        self.impulse = step_data.get('impulse', 1.0)
+                        self.lifts = step_data['lifts'].tolist()
+                        self.impulse = float(step_data['impulse'])
             
             if not self.is_animating:
                 self.lifts = [0, 0, 0]
                 self.impulse = 1.0
 
-            apply_forces_to_pellets(self.space, self.lifts, self.impulse)
-            self.space.step(1 / 60.0)
+            # Physics runs on a fixed 30Hz timestep; rendering interpolates
+            # between the last two steps so 60fps output stays smooth. Once
+            # the sim is idle and every pellet has come to rest, stepping is
+            # skipped entirely until the next keypress resets the simulation.
+            if self._pellets_asleep:
+                self.physics_accumulator = 0.0
+            else:
+                self.physics_accumulator += dt
+                while self.physics_accumulator >= PHYSICS_DT:
+                    apply_forces_to_pellets(self.space, self.get_normal(), self.impulse)
+                    self.space.step(PHYSICS_DT)
+                    self._prev_positions_2d = self._curr_positions_2d
+                    self._curr_positions_2d = get_pellet_positions_2d(self.space).copy()
+                    self.physics_accumulator -= PHYSICS_DT
+                if self.is_animating:
+                    self._idle_frames = 0
+                    self._low_speed_samples = 0
+                else:
+                    self._idle_frames += 1
+                    if self._idle_frames % 10 == 0:  # sample velocities sparsely
+                        if get_max_pellet_speed(self.space) < IDLE_SPEED_EPS:
+                            self._low_speed_samples += 1
+                        else:
+                            self._low_speed_samples = 0
+                        if self._low_speed_samples >= 3:
+                            self._pellets_asleep = True
 
             self.draw_all()
             pygame.display.flip()
-            self.clock.tick(60)
 
         pygame.quit()
         
@@ -240,64 +447,80 @@ class ShakerBedSim:
         glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
         self.draw_environment()
         glPushMatrix()
-        floor_plane = [0, 1, 0, 0.01]
-        shadow_matrix = np.zeros(16)
-        light_pos_arr = np.array(LIGHT_POSITION)
-        d = np.dot(floor_plane, light_pos_arr)
-        for i in range(4):
-            for j in range(4):
-                shadow_matrix[i*4+j] = (d if i==j else 0) - light_pos_arr[i] * floor_plane[j]
         glDisable(GL_LIGHTING)
         glColor4f(0.1, 0.1, 0.1, 0.5)
         glPushMatrix()
-        glMultMatrixf(shadow_matrix)
+        glMultMatrixf(self.shadow_matrix)
         self.draw_bed_model(is_shadow=True)
         glPopMatrix()
         glEnable(GL_LIGHTING)
         glPopMatrix()
         self.draw_bed_model()
-        for pellet in self.pellet_shapes:
-            self.draw_pellet(pellet.body.position, self.lifts)
+        self.draw_pellets(self.get_pellet_positions())
         self.draw_ui()
 
+    def get_pellet_positions(self):
+        """3D render positions for all pellets as an (N, 3) float32 array."""
+        normal = self.get_normal()
+        alpha = min(self.physics_accumulator / PHYSICS_DT, 1.0)
+        pos_2d = (self._prev_positions_2d
+                  + (self._curr_positions_2d - self._prev_positions_2d) * alpha)
+        positions = np.empty((len(pos_2d), 3), dtype=np.float32)
+        positions[:, 0] = pos_2d[:, 0]
+        positions[:, 2] = pos_2d[:, 1]
+        ny = normal[1]
+        if abs(ny) > 1e-6:
+            positions[:, 1] = -(pos_2d @ np.array([normal[0], normal[2]])) / ny + PELLET_R
+        else:
+            positions[:, 1] = PELLET_R
+        return positions
+
+    def draw_pellets(self, positions):
+        if self.pellet_shader is None:
+            glColor3f(0.2, 0.6, 0.8)  # one color call shared by every pellet
+            for pos in positions:
+                self.draw_pellet(pos)
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, positions.nbytes, positions)
+        glUseProgram(self.pellet_shader)
+        glUniform3f(self.pellet_color_uniform, 0.2, 0.6, 0.8)
+        glBindBuffer(GL_ARRAY_BUFFER, self.sphere_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 24, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, 24, ctypes.c_void_p(12))
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glEnableVertexAttribArray(self.instance_attrib)
+        glVertexAttribPointer(self.instance_attrib, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+        glVertexAttribDivisor(self.instance_attrib, 1)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, self.sphere_vertex_count, len(positions))
+        glVertexAttribDivisor(self.instance_attrib, 0)
+        glDisableVertexAttribArray(self.instance_attrib)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
     def draw_bed_model(self, is_shadow=False):
         glPushMatrix()
-        normal = get_plane_normal(self.lifts)
-        up = np.array([0, 1, 0])
-        axis = np.cross(up, normal)
-        angle = np.rad2deg(np.arccos(np.dot(up, normal)))
-        if np.linalg.norm(axis) > 1e-6:
-            glRotatef(angle, *axis)
-        if not is_shadow: glColor3f(0.5, 0.5, 0.55)
-        glBegin(GL_TRIANGLE_FAN)
-        glNormal3f(0,1,0)
-        glVertex3f(0, 0, 0)
-        for i in range(37):
-            angle_rad = np.deg2rad(i * 10)
-            glVertex3f(BED_R * np.cos(angle_rad), 0, BED_R * np.sin(angle_rad))
-        glEnd()
-        if not is_shadow: glColor3f(0.8, 0.8, 0.8)
-        glBegin(GL_QUAD_STRIP)
-        for i in range(37):
-            angle_rad = np.deg2rad(i * 10)
-            x, z = BED_R * np.cos(angle_rad), BED_R * np.sin(angle_rad)
-            glNormal3f(x, 0, z)
-            glVertex3f(x, 0, z)
-            glVertex3f(x, 0.5, z)
-        glEnd()
+        normal = self.get_normal()
+        # cross([0,1,0], normal) = (normal[2], 0, -normal[0]). atan2 of the
+        # axis length against the y component stays accurate for a nearly
+        # flat bed, where arccos(dot) loses precision as the dot nears 1.
+        axis_x, axis_z = normal[2], -normal[0]
+        axis_len = math.hypot(axis_x, axis_z)
+        if axis_len > 1e-6:
+            angle = math.degrees(math.atan2(axis_len, normal[1]))
+            glRotatef(angle, axis_x, 0, axis_z)
+        glCallList(self.bed_shadow_list if is_shadow else self.bed_list)
         glPopMatrix()
 
-    def draw_pellet(self, pos, lifts):
-        normal = get_plane_normal(self.lifts)
-        if abs(normal[1]) > 1e-6:
-             pellet_height = -(normal[0] * pos.x + normal[2] * pos.y) / normal[1]
-        else:
-             pellet_height = 0
+    def draw_pellet(self, pos):
+        """Fallback path: one compiled sphere re-issued per pellet."""
         glPushMatrix()
-        glTranslatef(pos.x, pellet_height + PELLET_R, pos.y)
-        glColor3f(0.2, 0.6, 0.8)
-        quad = gluNewQuadric()
-        gluSphere(quad, PELLET_R, 8, 8)
+        glTranslatef(pos[0], pos[1], pos[2])
+        glCallList(self.sphere_list)
         glPopMatrix()
 
     def draw_environment(self):